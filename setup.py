@@ -56,6 +56,7 @@ setup(
         'pycaption>=0.7.1,<=1.0.1',  # The latest Python 2.7 compatible version
         'requests>=2.9.1,<3.0.0',
         'babelfish>=0.5.5,<0.6.0',
+        'cachetools>=2.0.0,<4.0.0',  # The latest Python 2.7 compatible version
         'XBlock>=0.4.10,<2.0.0',
         'xblock-utils>=1.0.2,<=1.1.1'
     ],
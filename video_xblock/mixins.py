@@ -1,10 +1,21 @@
 """
 Video XBlock mixins geared toward specific subsets of functionality.
 """
+import functools
+import json
 import logging
+import os
+import re
+import urllib
+from multiprocessing.pool import ThreadPool
+from threading import Lock, local
 
 import requests
-from pycaption import detect_format, WebVTTWriter
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import ReadTimeoutError  # pylint: disable=import-error
+from requests.packages.urllib3.util.retry import Retry  # pylint: disable=import-error
+from cachetools import LRUCache, TTLCache
+from pycaption import detect_format, SRTReader, WebVTTReader, WebVTTWriter
 from webob import Response
 
 from xblock.core import XBlock
@@ -16,6 +27,117 @@ from .utils import import_from, ugettext as _, underscore_to_mixedcase, Transcri
 
 log = logging.getLogger(__name__)
 
+# Marks memoized values not fetched yet, where `None` is a legitimate value (e.g. course's language):
+NOT_FETCHED = object()
+
+# Shared HTTP session keeps connections alive, so subsequent requests to the same host skip TCP/TLS handshakes.
+HTTP_SESSION = requests.Session()
+# Only connection errors are retried: `read=False` re-raises failed reads at once, instead of repeating the request.
+HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=10, pool_maxsize=20, max_retries=Retry(total=3, read=False, backoff_factor=0.2)
+)
+HTTP_SESSION.mount('http://', HTTP_ADAPTER)
+HTTP_SESSION.mount('https://', HTTP_ADAPTER)
+HTTP_TIMEOUT = (3.05, 10)  # (connect, read) seconds; bounds the time a worker may wait for a stalled host
+
+# Thread pools fetching 3PlayMedia transcripts concurrently, keyed by process ID: threads don't survive forking.
+TPM_FETCH_POOLS = {}
+TPM_FETCH_POOLS_LOCK = Lock()
+TPM_FETCH_WORKERS = 8
+
+# 3PlayMedia transcripts lists keyed by (file_id, apikey), so re-renders of a block skip the discovery request.
+TPM_TRANSCRIPTS_LISTS = TTLCache(maxsize=64, ttl=300)
+TPM_TRANSCRIPTS_LISTS_LOCK = Lock()
+
+# Results of 3PlayMedia configuration validation keyed by (api_key, file_id), so bursts of Studio edits share them.
+TPM_CONFIG_VALIDATIONS = TTLCache(maxsize=128, ttl=10)
+TPM_CONFIG_VALIDATIONS_LOCK = Lock()
+
+# Time stamp line, e.g. "00:05:55.030 --> 00:05:57.200 align:start": only its first 29 characters are kept.
+TIMING_LINE_RE = re.compile(r'^(?=.*-->)(.{0,29}).*$', re.MULTILINE)
+BLANK_LINE_RE = re.compile(r'^$', re.MULTILINE)
+
+# `WebVTTWriter.write()` keeps caption set's layout on the writer, hence writers aren't shared between threads.
+VTT_WRITERS = local()
+
+# Caption readers detected by `pycaption`, keyed by transcripts' leading characters.
+CAPTION_READERS = LRUCache(maxsize=64)
+CAPTION_READERS_LOCK = Lock()
+
+
+def get_tpm_fetch_pool():
+    """
+    Return thread pool for 3PlayMedia transcripts fetching, shared by all the requests served by current process.
+
+    Pool is created on first use, so every (e.g. forked) worker process gets its own threads.
+    """
+    pid = os.getpid()
+    with TPM_FETCH_POOLS_LOCK:
+        if pid not in TPM_FETCH_POOLS:
+            TPM_FETCH_POOLS[pid] = ThreadPool(TPM_FETCH_WORKERS)
+        return TPM_FETCH_POOLS[pid]
+
+
+def gateway_error_response(error, url):
+    """
+    Log failed request to upstream host, and return 504 Response if it has timed out, 502 Response otherwise.
+
+    `requests` reports a body stalled after the headers as `ConnectionError` wrapping urllib3's `ReadTimeoutError`.
+    """
+    if isinstance(error, requests.Timeout) or any(isinstance(arg, ReadTimeoutError) for arg in error.args):
+        log.exception("Request to upstream host has timed out: {}".format(url))
+        return Response(status=504)
+    log.exception("Request to upstream host has failed: {}".format(url))
+    return Response(status=502)
+
+
+def json_response(data):
+    """
+    Wrap data serialized to compact JSON, the same `Response(json=data)` would produce, into Response object.
+    """
+    body = json.dumps(data, separators=(',', ':'))
+    return Response(body=body, content_type='application/json', charset='utf-8')
+
+
+def get_vtt_writer():
+    """
+    Return `pycaption.WebVTTWriter` reused by the current thread.
+    """
+    writer = getattr(VTT_WRITERS, 'writer', None)
+    if writer is None:
+        writer = VTT_WRITERS.writer = WebVTTWriter()
+    return writer
+
+
+def get_caption_reader(caps):
+    """
+    Pick `pycaption` reader class suitable for given raw transcripts.
+
+    WebVTT and SRT are recognised by their first lines, other formats are detected by `pycaption.detect_format`,
+    which probes every reader against the whole content, hence its results are cached.
+
+    Arguments:
+        caps (unicode): Raw transcripts.
+    Returns:
+        Reader class or None if transcripts format isn't supported.
+    """
+    head = caps[:512]
+    if head.lstrip(u'\ufeff').startswith('WEBVTT'):
+        return WebVTTReader
+    lines = head.splitlines()
+    if len(lines) > 1 and lines[0].isdigit() and '-->' in lines[1]:
+        return SRTReader
+
+    key = caps[:64]
+    with CAPTION_READERS_LOCK:
+        reader = CAPTION_READERS.get(key)
+    if reader is None:
+        reader = detect_format(caps)
+        if reader:
+            with CAPTION_READERS_LOCK:
+                CAPTION_READERS[key] = reader
+    return reader
+
 
 @XBlock.wants('contentstore')
 class ContentStoreMixin(XBlock):
@@ -57,6 +179,12 @@ class TranscriptsMixin(XBlock):
     """
 
     THREE_PLAY_MEDIA_API_DOMAIN = 'https://static.3playmedia.com/'
+    THREE_PLAY_MEDIA_LIST_URL = THREE_PLAY_MEDIA_API_DOMAIN + 'files/{}/transcripts?{}'
+    THREE_PLAY_MEDIA_TRANSCRIPT_URL = THREE_PLAY_MEDIA_API_DOMAIN + 'files/{}/transcripts/{}?{}'
+    HANDLER_QUERY_PLACEHOLDER = '__query__'
+
+    _enabled_transcripts_cache = None
+    _transcripts_by_lang_cache = None
 
     threeplaymedia_streaming = Boolean(
         default=False,
@@ -94,9 +222,9 @@ class TranscriptsMixin(XBlock):
             unicode: Transcripts converted into WebVTT format.
         """
         if caps:
-            reader = detect_format(caps)
+            reader = get_caption_reader(caps)
             if reader:
-                return WebVTTWriter().write(reader().read(caps))
+                return get_vtt_writer().write(reader().read(caps))
         return u''
 
     @staticmethod
@@ -104,12 +232,33 @@ class TranscriptsMixin(XBlock):
         """
         Utility method to extract text from WebVTT format transcript.
         """
-        text_lines = []
-        for line in vtt_content.splitlines():
-            if '-->' in line or line == '':
-                continue
-            text_lines.append(line)
-        return ' '.join(text_lines)
+        return ' '.join(line for line in vtt_content.splitlines() if line and '-->' not in line)
+
+    @property
+    def _enabled_transcripts_cached(self):
+        """
+        Enabled transcripts, memoized on the block instance.
+
+        XBlock instances live as long as a single request, so transcripts aren't re-fetched (e.g. from 3PlayMedia)
+        by every consumer during a render. Cache is reset, along with `_transcripts_by_lang`, whenever player state
+        is updated.
+        """
+        if self._enabled_transcripts_cache is None:
+            self._enabled_transcripts_cache = self.get_enabled_transcripts()
+        return self._enabled_transcripts_cache
+
+    @property
+    def _transcripts_by_lang(self):
+        """
+        Enabled transcripts mapped by language code, memoized along with enabled transcripts.
+
+        The first transcript is kept if a language is enabled more than once.
+        """
+        if self._transcripts_by_lang_cache is None:
+            self._transcripts_by_lang_cache = {
+                transcript.get('lang'): transcript for transcript in reversed(self._enabled_transcripts_cached)
+            }
+        return self._transcripts_by_lang_cache
 
     def route_transcripts(self):
         """
@@ -122,35 +271,40 @@ class TranscriptsMixin(XBlock):
             transcripts (unicode): Raw transcripts.
         """
         log.debug("Routing transcripts: 3PM status={}".format(self.threeplaymedia_streaming))
-        transcripts = self.get_enabled_transcripts()
+        handler_urls = {}
+
+        def handler_url(handler_name, query):
+            """
+            Build handler URL from a template, requested from runtime only once per handler.
+            """
+            if handler_name not in handler_urls:
+                handler_urls[handler_name] = self.runtime.handler_url(
+                    self, handler_name, query=self.HANDLER_QUERY_PLACEHOLDER
+                )
+            return handler_urls[handler_name].replace(self.HANDLER_QUERY_PLACEHOLDER, query, 1)
+
+        transcripts = self._enabled_transcripts_cached
         for tran in transcripts:
+            tran = dict(tran)  # keep memoized transcripts intact
             if self.threeplaymedia_streaming:
                 # download URL remains hidden behind the handler:
-                tran['download_url'] = self.runtime.handler_url(
-                    self, 'fetch_from_three_play_media', query="{}={}".format(tran['lang_id'], tran['id'])
+                tran['download_url'] = handler_url(
+                    'fetch_from_three_play_media', query="{}={}".format(tran['lang_id'], tran['id'])
                 )
                 # NOTE(wowkalucky): for some reason handler's URL doesn't work in combination
                 # Brightcove player/Safari browser. Safari just doesn't populate text tracks with cues!
                 # So, we have to expose raw 3PM URL for Brightcove users, for now...
                 if str(self.player_name) != PlayerName.BRIGHTCOVE:
-                    tran['url'] = self.runtime.handler_url(
-                        self, 'fetch_from_three_play_media', query="{}={}".format(tran['lang_id'], tran['id'])
-                    )
+                    tran['url'] = tran['download_url']
             elif not tran['url'].endswith('.vtt'):
-                tran['url'] = self.runtime.handler_url(
-                    self, 'srt_to_vtt', query=tran['url']
-                )
+                tran['url'] = handler_url('srt_to_vtt', query=tran['url'])
             yield tran
 
     def get_transcript_download_link(self):
         """
         Return link for downloading of a transcript of the current captions' language (if a transcript exists).
         """
-        transcripts = self.get_enabled_transcripts()
-        for transcript in transcripts:
-            if transcript.get('lang') == self.captions_language:
-                return transcript.get('url')
-        return ''
+        return self._transcripts_by_lang.get(self.captions_language, {}).get('url', '')
 
     def create_transcript_file(self, ext='.vtt', trans_str='', reference_name=''):
         """
@@ -158,20 +312,25 @@ class TranscriptsMixin(XBlock):
 
         Arguments:
             ext (str): format of transcript file, default is vtt.
-            trans_str (str): multiple string for convert to vtt file.
-            reference_name (str): name of transcript file.
+            trans_str (unicode or bytes): multiple string for convert to vtt file, bytes are expected in UTF-8.
+            reference_name (unicode or bytes): name of transcript file.
         Returns:
             File's file_name and external_url.
         """
+        if isinstance(reference_name, bytes):
+            reference_name = reference_name.decode('utf-8')
+        # Large transcripts shouldn't be copied once again, if they're encoded already:
+        body = trans_str if isinstance(trans_str, bytes) else trans_str.encode('utf-8')
+
         # Define location of default transcript as a future asset and prepare content to store in assets
-        file_name = reference_name.replace(" ", "_") + ext
+        file_name = reference_name.replace(u" ", u"_") + ext
         course_key = self.course_key
         content_loc = self.static_content.compute_location(course_key, file_name)  # AssetLocator object
         content = self.static_content(
             content_loc,
             file_name,
             'application/json',
-            trans_str.encode('UTF-8')
+            body
         )  # StaticContent object
         external_url = '/' + str(content_loc)
 
@@ -195,21 +354,19 @@ class TranscriptsMixin(XBlock):
                 url (str)   : External url for vtt file.
                 label (str) : Name of language.
         """
-        out, response = [], {}
-        for item in caps.splitlines():
-            if item == '':
-                item = ' \n'
-            elif '-->' in item:
-                # This line is deltatime stamp 00:05:55.030 --> 00:05:57.200.
-                # Length this line is 29 characters.
-                item = item[:29]
-            out.append(item)
-
-        caps = u'\n'.join(out).replace('\n&nbsp;', '')
+        response = {}
+        if caps:
+            # Whole buffer is processed by regular expressions rather than line by line:
+            caps = caps.replace('\r\n', '\n').replace('\r', '\n')
+            if caps.endswith('\n'):
+                caps = caps[:-1]  # trailing line break doesn't start a new (blank) line
+            caps = TIMING_LINE_RE.sub(r'\1', caps)
+            caps = BLANK_LINE_RE.sub(' \n', caps)
+            caps = caps.replace('\n&nbsp;', '')
         sub = self.convert_caps_to_vtt(caps=caps)
         reference_name = "{lang_label}_captions_video_{video_id}".format(
             lang_label=lang_label, video_id=video_id
-        ).encode('utf8')
+        )
         file_name, external_url = self.create_transcript_file(
             trans_str=sub, reference_name=reference_name
         )
@@ -230,12 +387,23 @@ class TranscriptsMixin(XBlock):
 
         if feedback['status'] is Status.error:
             log.error("3PlayMedia transcripts fetching API request has failed!\n{}".format(feedback['message']))
-            raise StopIteration
+            return
 
-        for transcript_data in transcripts_list:
-            transcript = self.fetch_single_3pm_translation(transcript_data)
+        if not transcripts_list:
+            return
+
+        fetch_translation = functools.partial(
+            self.fetch_single_3pm_translation, video_id=self.get_player().media_id(self.href)
+        )
+        if len(transcripts_list) > 1:
+            # Transcripts are fetched concurrently, so overall latency approaches the slowest single request:
+            transcripts = get_tpm_fetch_pool().map(fetch_translation, transcripts_list)
+        else:
+            transcripts = [fetch_translation(transcripts_list[0])]
+
+        for transcript in transcripts:
             if transcript is None:
-                raise StopIteration
+                return
             transcript_ordered_dict = transcript._asdict()
             transcript_ordered_dict['content'] = ''  # we don't want to parse it to JSON
             yield transcript_ordered_dict
@@ -246,18 +414,20 @@ class TranscriptsMixin(XBlock):
 
         :return: (list of dicts OR dict) all available transcripts attached to file with ID OR error dict
         """
-        domain = self.THREE_PLAY_MEDIA_API_DOMAIN
-
         transcripts_list = []
         failure_message = _("3PlayMedia transcripts fetching API request has failed!")
         success_message = _("3PlayMedia transcripts fetched successfully.")
         feedback = {'status': Status.error, 'message': failure_message}
 
+        with TPM_TRANSCRIPTS_LISTS_LOCK:
+            cached_transcripts_list = TPM_TRANSCRIPTS_LISTS.get((file_id, apikey))
+        if cached_transcripts_list is not None:
+            return {'status': Status.success, 'message': success_message}, cached_transcripts_list
+
         try:
-            response = requests.get(
-                '{domain}files/{file_id}/transcripts?apikey={api_key}'.format(
-                    domain=domain, file_id=file_id, api_key=apikey
-                )
+            response = HTTP_SESSION.get(
+                self.THREE_PLAY_MEDIA_LIST_URL.format(file_id, urllib.urlencode([('apikey', apikey)])),
+                timeout=HTTP_TIMEOUT
             )
             log.debug(response._content)  # pylint: disable=protected-access
         except IOError:
@@ -268,36 +438,38 @@ class TranscriptsMixin(XBlock):
             transcripts_list = response.json()
             feedback['status'] = Status.success
             feedback['message'] = success_message
+            with TPM_TRANSCRIPTS_LISTS_LOCK:
+                TPM_TRANSCRIPTS_LISTS[(file_id, apikey)] = transcripts_list
         else:
             feedback['status'] = Status.error
         return feedback, transcripts_list
 
-    def fetch_single_3pm_translation(self, transcript_data, format_id=TPMApiTranscriptFormatID.WEBVTT):
+    def fetch_single_3pm_translation(self, transcript_data, format_id=TPMApiTranscriptFormatID.WEBVTT, video_id=None):
         """
         Fetch single transcript for given file ID in given format.
 
         :param transcript_data:
         :param format_id: defauts to VTT
+        :param video_id: player's media ID of the video, computed if not provided
         :return: (namedtuple instance) transcript data
         """
         transcript_id = transcript_data.get('id', '')
         lang_id = transcript_data.get('language_id')
-        external_api_url = '{domain}files/{file_id}/transcripts/{tid}?apikey={api_key}&format_id={format_id}'.format(
-            domain=self.THREE_PLAY_MEDIA_API_DOMAIN,
-            file_id=self.threeplaymedia_file_id,
-            tid=transcript_id,
-            api_key=self.threeplaymedia_apikey,
-            format_id=format_id
+        external_api_url = self.THREE_PLAY_MEDIA_TRANSCRIPT_URL.format(
+            self.threeplaymedia_file_id,
+            transcript_id,
+            urllib.urlencode([('apikey', self.threeplaymedia_apikey), ('format_id', format_id)])
         )
         try:
-            content = requests.get(external_api_url).text
+            content = HTTP_SESSION.get(external_api_url, timeout=HTTP_TIMEOUT).text
         except Exception:  # pylint: disable=broad-except
             log.exception(_("Transcript fetching failure: language [{}]").format(TPMApiLanguage(lang_id)))
             return
 
         lang_code = TPMApiLanguage(lang_id)
         lang_label = lang_code.name
-        video_id = self.get_player().media_id(self.href)
+        if video_id is None:
+            video_id = self.get_player().media_id(self.href)
         source = TranscriptSource.THREE_PLAY_MEDIA
         return Transcript(
             id=transcript_id,
@@ -324,8 +496,12 @@ class TranscriptsMixin(XBlock):
         """
         trans_path = self.get_path_for(request.query_string)
         filename = self.get_file_name_from_path(trans_path)
-        transcript = requests.get(request.host_url + request.query_string).text
-        response = Response(transcript)
+        # Body is read in full here, so failures in the middle of it get reported too; its bytes are passed on as is:
+        try:
+            transcript = HTTP_SESSION.get(request.host_url + request.query_string, timeout=HTTP_TIMEOUT).content
+        except requests.RequestException as error:
+            return gateway_error_response(error, request.query_string)
+        response = Response(body=transcript)
         headerlist = [
             ('Content-Type', 'text/plain'),
             ('Content-Disposition', 'attachment; filename={}'.format(filename))
@@ -347,7 +523,17 @@ class TranscriptsMixin(XBlock):
             webob.Response: WebVTT transcripts wrapped in Response object.
         """
         caps_path = request.query_string
-        caps = requests.get(request.host_url + caps_path).text
+        try:
+            response = HTTP_SESSION.get(request.host_url + caps_path, timeout=HTTP_TIMEOUT)
+        except requests.RequestException as error:
+            return gateway_error_response(error, caps_path)
+        # `pycaption` needs the whole body; decode it directly to skip `requests`' charset detection over it,
+        # unless the body turns out not to be UTF-8 (e.g. legacy Windows-1252 SRT files) or the declared charset
+        # is unknown to Python (e.g. "utf8mb4"):
+        try:
+            caps = response.content.decode(response.encoding or 'utf-8')
+        except (UnicodeDecodeError, LookupError):
+            caps = response.text
         return Response(self.convert_caps_to_vtt(caps))
 
     @XBlock.handler
@@ -389,27 +575,32 @@ class TranscriptsMixin(XBlock):
 
         # the very first request during xblock creating:
         if api_key is None and file_id is None:
-            return Response(json={'isValid': is_valid, 'message': _("Initialization")})
+            return json_response({'isValid': is_valid, 'message': _("Initialization")})
 
         # the case when no options provided, and streaming is disabled:
         if not streaming_enabled:
-            return Response(json={'isValid': is_valid, 'message': success_message})
+            return json_response({'isValid': is_valid, 'message': success_message})
 
         # options partially provided or both empty, but streaming is enabled:
         if not (api_key and file_id):
             is_valid = False
-            return Response(json={'isValid': is_valid, 'message': invalid_message})
-
-        feedback, transcripts_list = self.get_3pm_transcripts_list(file_id, api_key)
-
-        if transcripts_list and feedback['status'] is Status.success:
+            return json_response({'isValid': is_valid, 'message': invalid_message})
+
+        # Only the outcome is cached, since the message is translated into the language of each request:
+        with TPM_CONFIG_VALIDATIONS_LOCK:
+            is_valid = TPM_CONFIG_VALIDATIONS.get((api_key, file_id))
+        if is_valid is None:
+            feedback, transcripts_list = self.get_3pm_transcripts_list(file_id, api_key)
+            is_valid = bool(transcripts_list) and feedback['status'] is Status.success
+            with TPM_CONFIG_VALIDATIONS_LOCK:
+                TPM_CONFIG_VALIDATIONS[(api_key, file_id)] = is_valid
+
+        if is_valid:
             message = success_message
-            is_valid = True
         else:
-            message = feedback['message']
-            is_valid = False
+            message = _("3PlayMedia transcripts fetching API request has failed!")
 
-        return Response(json={'isValid': is_valid, 'message': message})
+        return json_response({'isValid': is_valid, 'message': message})
 
 
 @XBlock.needs('modulestore')
@@ -476,6 +667,11 @@ class PlaybackStateMixin(XBlock):
         'current_time', 'muted', 'playback_rate', 'volume', 'transcripts_enabled',
         'captions_enabled', 'captions_language', 'transcripts'
     )
+    player_state_mixedcase_fields = tuple(
+        (field_name, underscore_to_mixedcase(field_name)) for field_name in player_state_fields
+    )
+
+    _course_default_language = NOT_FETCHED
 
     @property
     def course_default_language(self):
@@ -483,31 +679,35 @@ class PlaybackStateMixin(XBlock):
         Utility method returns course's language.
 
         Falls back to 'en' if runtime doen't provide `modulestore` service.
+        The value is memoized on the block instance to avoid repeated modulestore lookups.
         """
-        try:
-            course = self.runtime.service(self, 'modulestore').get_course(self.course_id)
-            return course.language
-        except NoSuchServiceError:
-            return DEFAULT_LANG
+        if self._course_default_language is NOT_FETCHED:
+            try:
+                course = self.runtime.service(self, 'modulestore').get_course(self.course_id)
+                self._course_default_language = course.language
+            except NoSuchServiceError:
+                self._course_default_language = DEFAULT_LANG
+        return self._course_default_language
 
     @property
     def player_state(self):
         """
         Return video player state as a dictionary.
         """
-        transcripts = self.get_enabled_transcripts()
+        transcripts = self._enabled_transcripts_cached
         transcripts_object = {
             trans['lang']: {'url': trans['url'], 'label': trans['label']}
             for trans in transcripts
             }
         state = {
+            mixedcase_field_name: getattr(self, field_name)
+            for field_name, mixedcase_field_name in self.player_state_mixedcase_fields
+        }
+        state.update({
             'captionsLanguage': self.captions_language or self.course_default_language,
             'transcriptsObject': transcripts_object,
             'transcripts': transcripts
-        }
-        for field_name in self.player_state_fields:
-            mixedcase_field_name = underscore_to_mixedcase(field_name)
-            state.setdefault(mixedcase_field_name, getattr(self, field_name))
+        })
         return state
 
     @player_state.setter
@@ -520,6 +720,8 @@ class PlaybackStateMixin(XBlock):
         """
         for field_name in self.player_state_fields:
             setattr(self, field_name, state.get(field_name, getattr(self, field_name)))
+        self._enabled_transcripts_cache = None  # pylint: disable=attribute-defined-outside-init
+        self._transcripts_by_lang_cache = None  # pylint: disable=attribute-defined-outside-init
 
     @XBlock.json_handler
     def save_player_state(self, request, _suffix=''):
@@ -536,9 +738,9 @@ class PlaybackStateMixin(XBlock):
             'transcripts': self.transcripts
         }
 
-        for field_name in self.player_state_fields:
+        for field_name, mixedcase_field_name in self.player_state_mixedcase_fields:
             if field_name not in player_state:
-                player_state[field_name] = request[underscore_to_mixedcase(field_name)]
+                player_state[field_name] = request[mixedcase_field_name]
 
         # make sure player's volume is down when muted:
         if player_state['muted']:
@@ -3,16 +3,23 @@ VideoXBlock mixins test cases.
 """
 
 import json
+import socket
+import threading
 from collections import Iterable, OrderedDict
 
 import requests
 from django.test import RequestFactory
 from django.test.utils import override_settings
 from mock import patch, Mock, MagicMock, PropertyMock
+from pycaption import SRTReader, WebVTTReader
 from webob import Response
 from xblock.exceptions import NoSuchServiceError
 
 from video_xblock.constants import DEFAULT_LANG, TPMApiLanguage, Status
+from video_xblock.mixins import (
+    CAPTION_READERS, HTTP_TIMEOUT, TPM_CONFIG_VALIDATIONS, TPM_TRANSCRIPTS_LISTS, get_caption_reader,
+    get_tpm_fetch_pool, get_vtt_writer, json_response,
+)
 from video_xblock.tests.unit.base import VideoXBlockTestBase
 from video_xblock.tests.unit.mocks.base import ResponseStub
 from video_xblock.tests.unit.test_video_xblock_handlers import arrange_request_mock
@@ -20,6 +27,36 @@ from video_xblock.utils import loader, Transcript, ugettext as _
 from video_xblock.video_xblock import VideoXBlock
 
 
+def start_stalled_server(test_case, response_head=None):
+    """
+    Start local server which accepts connections but never completes a response, and return its URL.
+
+    If `response_head` is given, it is sent in reply to the first request, e.g. to stall after the headers.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    test_case.addCleanup(server.close)
+    server.bind(('127.0.0.1', 0))
+    server.listen(5)  # Connections are completed by the OS, so they needn't be accepted unless replied to.
+
+    def reply():
+        """
+        Send `response_head` to the first client, and keep its connection open.
+        """
+        connection, _address = server.accept()
+        test_case.addCleanup(connection.close)
+        connection.recv(4096)
+        connection.sendall(response_head)
+
+    if response_head is not None:
+        replying = threading.Thread(target=reply)
+        replying.daemon = True
+        replying.start()
+    return 'http://127.0.0.1:{}/'.format(server.getsockname()[1])
+
+
+STALLED_BODY_HEAD = 'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 100\r\n\r\nWEBVTT\n'
+
+
 class ContentStoreMixinTest(VideoXBlockTestBase):
     """Test ContentStoreMixin"""
 
@@ -165,10 +202,24 @@ class PlaybackStateMixinTests(VideoXBlockTestBase):
             self.xblock.course_id = course_id_mock = PropertyMock()
 
             self.assertEqual(self.xblock.course_default_language, 'test_lang')
+            self.assertEqual(self.xblock.course_default_language, 'test_lang')  # memoized
             service_mock.assert_called_once_with(self.xblock, 'modulestore')
             lang_mock.assert_called_once()
             course_id_mock.assert_not_called()
 
+    def test_course_default_language_none(self):
+        """
+        Test xBlock's `course_default_language` property memoizes course without language too.
+        """
+        with patch.object(self.xblock, 'runtime') as runtime_mock:
+            get_course_mock = runtime_mock.service.return_value.get_course
+            get_course_mock.return_value.language = None
+            self.xblock.course_id = 'test:course:id'
+
+            self.assertIsNone(self.xblock.course_default_language)
+            self.assertIsNone(self.xblock.course_default_language)  # memoized
+            get_course_mock.assert_called_once_with('test:course:id')
+
     def test_player_state(self):
         """
         Test player state property.
@@ -327,6 +378,15 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
     Test TranscriptsMixin
     """
 
+    def setUp(self):
+        """
+        Drop module-level caches shared between tests.
+        """
+        super(TranscriptsMixinTests, self).setUp()
+        TPM_TRANSCRIPTS_LISTS.clear()
+        TPM_CONFIG_VALIDATIONS.clear()
+        CAPTION_READERS.clear()
+
     @patch('video_xblock.mixins.WebVTTWriter.write')
     @patch('video_xblock.mixins.detect_format')
     def test_convert_caps_to_vtt(self, detect_format_mock, vtt_writer_mock):
@@ -352,6 +412,46 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         vtt_writer_mock.assert_not_called()
         detect_format_mock.assert_called_once_with('test caps')
 
+    def test_json_response(self):
+        """
+        Test JSON response is built with compact separators.
+        """
+        response = json_response({'isValid': True})
+
+        self.assertEqual(response.body, '{"isValid":true}')
+        self.assertEqual(response.content_type, 'application/json')
+
+    def test_vtt_to_text(self):
+        """
+        Test text is extracted from WebVTT transcript.
+        """
+        vtt_content = u'WEBVTT\n\n00:00:01.000 --> 00:00:02.000\nFirst line\n\n00:00:02.000 --> 00:00:03.000\nSecond'
+
+        self.assertEqual(self.xblock.vtt_to_text(vtt_content), u'WEBVTT First line Second')
+
+    def test_get_vtt_writer(self):
+        """
+        Test WebVTT writer is reused within a thread.
+        """
+        self.assertIs(get_vtt_writer(), get_vtt_writer())
+
+    @patch('video_xblock.mixins.detect_format')
+    def test_get_caption_reader(self, detect_format_mock):
+        """
+        Test caption reader is picked without probing all the readers for WebVTT and SRT transcripts.
+        """
+        # Arrange
+        detect_format_mock.return_value = reader_mock = Mock()
+
+        # Act & Assert
+        self.assertIs(get_caption_reader(u'WEBVTT\n\n00:00:01.000 --> 00:00:02.000\nText'), WebVTTReader)
+        self.assertIs(get_caption_reader(u'1\n00:00:01,000 --> 00:00:02,000\nText'), SRTReader)
+        detect_format_mock.assert_not_called()
+
+        self.assertIs(get_caption_reader(u'<tt>test caps</tt>'), reader_mock)
+        self.assertIs(get_caption_reader(u'<tt>test caps</tt>'), reader_mock)
+        detect_format_mock.assert_called_once_with(u'<tt>test caps</tt>')
+
     @patch.object(VideoXBlock, 'static_content')
     @patch.object(VideoXBlock, 'contentstore')
     @patch.object(VideoXBlock, 'course_key', new_callable=PropertyMock)
@@ -380,15 +480,65 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         self.assertEqual(file_name, 'test_transcripts.vtt')
         self.assertEqual(external_url, '/test-location.vtt')
 
+    @patch.object(VideoXBlock, 'static_content')
+    @patch.object(VideoXBlock, 'contentstore')
+    @patch.object(VideoXBlock, 'course_key', new_callable=PropertyMock)
+    def test_create_transcript_file_from_unicode(self, _course_key, _contentstore_mock, static_content_mock):
+        """
+        Test transcript file is created from non-ASCII unicode transcript and reference name.
+        """
+        # Arrange
+        static_content_mock.compute_location = Mock(return_value='test-location.vtt')
+
+        # Act
+        file_name, _external_url = self.xblock.create_transcript_file(
+            trans_str=u'r\xe9sum\xe9', reference_name=u'Fran\xe7ais transcripts'.encode('utf-8')
+        )
+
+        # Assert
+        static_content_mock.assert_called_with(
+            'test-location.vtt', u'Fran\xe7ais_transcripts.vtt', 'application/json', 'r\xc3\xa9sum\xc3\xa9'
+        )
+        self.assertEqual(file_name, u'Fran\xe7ais_transcripts.vtt')
+
+    @patch.object(VideoXBlock, 'create_transcript_file')
+    @patch.object(VideoXBlock, 'convert_caps_to_vtt')
+    def test_convert_3playmedia_caps_to_vtt(self, convert_caps_to_vtt_mock, create_transcript_file_mock):
+        """
+        Test 3PlayMedia transcripts are cleaned up before WebVTT conversion.
+        """
+        # Arrange
+        caps = (
+            u'WEBVTT\r\n'
+            u'\r\n'
+            u'00:05:55.030 --> 00:05:57.200 align:start position:10%\r\n'
+            u'Some text\r\n'
+            u'&nbsp;\r\n'
+        )
+        convert_caps_to_vtt_mock.return_value = 'vtt transcript'
+        create_transcript_file_mock.return_value = 'test_file.vtt', '/test-location.vtt'
+
+        # Act
+        response = self.xblock.convert_3playmedia_caps_to_vtt(caps, 'test_video_id', 'en', 'English')
+
+        # Assert
+        convert_caps_to_vtt_mock.assert_called_once_with(
+            caps=u'WEBVTT\n \n\n00:05:55.030 --> 00:05:57.200\nSome text'
+        )
+        create_transcript_file_mock.assert_called_once_with(
+            trans_str='vtt transcript', reference_name='English_captions_video_test_video_id'
+        )
+        self.assertEqual(response, {'lang': 'en', 'url': '/test-location.vtt', 'label': 'English'})
+
     @patch.object(VideoXBlock, 'get_file_name_from_path')
-    @patch('video_xblock.mixins.requests.get')
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
     def test_download_transcript_handler_response_object(self, get_mock, get_filename_mock):
         """
         Test transcripts downloading works properly.
         """
         # Arrange
         get_filename_mock.return_value = 'transcript.vtt'
-        get_mock.return_value.text = 'vtt transcripts'
+        get_mock.return_value.content = 'vtt transcripts'
         request_mock = MagicMock()
         request_mock.host_url = 'test.host'
         request_mock.query_string = '/test-query-string'
@@ -398,12 +548,60 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
 
         # Assert
         self.assertIsInstance(vtt_response, Response)
-        self.assertEqual(vtt_response.text, 'vtt transcripts')
         self.assertEqual(vtt_response.headerlist, [
             ('Content-Type', 'text/plain'),
             ('Content-Disposition', 'attachment; filename={}'.format('transcript.vtt'))
         ])
-        get_mock.assert_called_once_with('test.host/test-query-string')
+        self.assertEqual(vtt_response.body, 'vtt transcripts')
+        get_mock.assert_called_once_with('test.host/test-query-string', timeout=HTTP_TIMEOUT)
+
+    @patch.object(VideoXBlock, 'get_file_name_from_path')
+    @patch('video_xblock.mixins.HTTP_TIMEOUT', (1, 0.1))
+    def test_download_transcript_handler_timeout(self, _get_filename_mock):
+        """
+        Test transcripts downloading fails fast if transcript's host doesn't respond in time.
+        """
+        # Arrange
+        request_mock = MagicMock(host_url=start_stalled_server(self), query_string='test.vtt')
+
+        # Act
+        response = self.xblock.download_transcript(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(response.status_code, 504)
+
+    @patch.object(VideoXBlock, 'get_file_name_from_path')
+    @patch('video_xblock.mixins.HTTP_TIMEOUT', (1, 0.1))
+    def test_download_transcript_handler_body_timeout(self, _get_filename_mock):
+        """
+        Test transcripts downloading fails fast if transcript's host stalls after sending response headers.
+        """
+        # Arrange
+        request_mock = MagicMock(
+            host_url=start_stalled_server(self, response_head=STALLED_BODY_HEAD), query_string='test.vtt'
+        )
+
+        # Act
+        response = self.xblock.download_transcript(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(response.status_code, 504)
+
+    @patch.object(VideoXBlock, 'get_file_name_from_path')
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
+    def test_download_transcript_handler_failure(self, get_mock, _get_filename_mock):
+        """
+        Test transcripts downloading reports bad gateway if transcript's host is unavailable.
+        """
+        # Arrange
+        get_mock.side_effect = requests.ConnectionError()
+        request_mock = MagicMock()
+
+        # Act
+        response = self.xblock.download_transcript(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(response.status_code, 502)
 
     @patch.object(VideoXBlock, 'captions_language', new_callable=PropertyMock)
     @patch.object(VideoXBlock, 'transcripts', new_callable=PropertyMock)
@@ -416,6 +614,20 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
 
         self.assertEqual(self.xblock.get_transcript_download_link(), 'test_transcript.vtt')
 
+    @patch.object(VideoXBlock, 'captions_language', new_callable=PropertyMock)
+    @patch.object(VideoXBlock, 'transcripts', new_callable=PropertyMock)
+    def test_get_transcript_download_link_duplicated_language(self, trans_mock, lang_mock):
+        """
+        Test transcript downloading link points to the first transcript of the current language.
+        """
+        lang_mock.return_value = 'en'
+        trans_mock.return_value = (
+            '[{"lang": "uk", "url": "uk_transcript.vtt"}, {"lang": "en", "url": "first_transcript.vtt"},'
+            ' {"lang": "en", "url": "second_transcript.vtt"}]'
+        )
+
+        self.assertEqual(self.xblock.get_transcript_download_link(), 'first_transcript.vtt')
+
     @patch.object(VideoXBlock, 'transcripts', new_callable=PropertyMock)
     def test_get_transcript_download_link_fallback(self, trans_mock):
         """
@@ -425,6 +637,22 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
 
         self.assertEqual(self.xblock.get_transcript_download_link(), '')
 
+    def test_enabled_transcripts_cached(self):
+        """
+        Test enabled transcripts are memoized until player state is updated.
+        """
+        with patch.object(self.xblock, 'get_enabled_transcripts') as get_enabled_transcripts_mock:
+            get_enabled_transcripts_mock.return_value = [{"lang": "en", "url": "test-trans.vtt"}]
+
+            # Act
+            self.xblock.get_transcript_download_link()
+            list(self.xblock.route_transcripts())
+            self.xblock.player_state = {}
+            self.xblock.get_transcript_download_link()
+
+            # Assert
+            self.assertEqual(get_enabled_transcripts_mock.call_count, 2)
+
     def test_route_transcripts(self):
         """
         Test transcript rerouting works.
@@ -434,7 +662,7 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         with patch.object(self.xblock, 'runtime') as runtime_mock, \
                 patch.object(self.xblock, 'get_enabled_transcripts') as get_enabled_transcripts_mock:
             handler_url_mock = runtime_mock.handler_url
-            handler_url_mock.return_value = 'test-trans.vtt'
+            handler_url_mock.return_value = '/handler/srt_to_vtt?__query__'
             get_enabled_transcripts_mock.return_value = transcripts
             self.xblock.threeplaymedia_streaming = False
 
@@ -443,22 +671,48 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
 
             # Assert
             self.assertIsInstance(transcripts_routes, Iterable)
-            self.assertEqual(next(transcripts_routes), {'url': 'test-trans.vtt'})
+            self.assertEqual(next(transcripts_routes), {'url': '/handler/srt_to_vtt?test-trans.srt'})
             handler_url_mock.assert_called_once_with(
-                self.xblock, 'srt_to_vtt', query='test-trans.srt'
+                self.xblock, 'srt_to_vtt', query='__query__'
             )
 
-    @patch('video_xblock.mixins.requests', new_callable=MagicMock)
+    def test_route_transcripts_with_3pm_streaming(self):
+        """
+        Test 3PlayMedia transcripts are routed to the fetching handler, built once for all transcripts.
+        """
+        # Arrange
+        transcripts = [{"lang_id": "1", "id": "first_id"}, {"lang_id": "2", "id": "second_id"}]
+        with patch.object(self.xblock, 'runtime') as runtime_mock, \
+                patch.object(self.xblock, 'get_enabled_transcripts') as get_enabled_transcripts_mock:
+            handler_url_mock = runtime_mock.handler_url
+            handler_url_mock.return_value = '/handler/fetch?__query__'
+            get_enabled_transcripts_mock.return_value = transcripts
+            self.xblock.threeplaymedia_streaming = True
+
+            # Act
+            transcripts_routes = list(self.xblock.route_transcripts())
+
+            # Assert
+            self.assertEqual([tran['url'] for tran in transcripts_routes], [
+                '/handler/fetch?1=first_id', '/handler/fetch?2=second_id'
+            ])
+            self.assertEqual([tran['download_url'] for tran in transcripts_routes], [
+                '/handler/fetch?1=first_id', '/handler/fetch?2=second_id'
+            ])
+            handler_url_mock.assert_called_once_with(
+                self.xblock, 'fetch_from_three_play_media', query='__query__'
+            )
+
+    @patch('video_xblock.mixins.HTTP_SESSION', new_callable=MagicMock)
     @patch.object(VideoXBlock, 'convert_caps_to_vtt')
-    def test_srt_to_vtt(self, convert_caps_to_vtt_mock, requests_mock):
+    def test_srt_to_vtt(self, convert_caps_to_vtt_mock, session_mock):
         """
         Test xBlock's srt-to-vtt convertation works properly.
         """
         # Arrange
         request_mock = MagicMock()
         convert_caps_to_vtt_mock.return_value = 'vtt transcripts'
-        requests_mock.get.return_value.text = text_mock = PropertyMock()
-        text_mock.return_value = 'vtt transcripts'
+        session_mock.get.return_value = ResponseStub(body='srt transcripts', encoding=None)
 
         # Act
         vtt_response = self.xblock.srt_to_vtt(request_mock, 'unused suffix')
@@ -466,7 +720,92 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         # Assert
         self.assertIsInstance(vtt_response, Response)
         self.assertEqual(vtt_response.text, 'vtt transcripts')
-        convert_caps_to_vtt_mock.assert_called_once_with(text_mock)
+        convert_caps_to_vtt_mock.assert_called_once_with(u'srt transcripts')
+
+    @patch('video_xblock.mixins.HTTP_TIMEOUT', (1, 0.1))
+    def test_srt_to_vtt_timeout(self):
+        """
+        Test xBlock's srt-to-vtt convertation fails fast if transcript's host doesn't respond in time.
+        """
+        # Arrange
+        request_mock = MagicMock(host_url=start_stalled_server(self), query_string='test.srt')
+
+        # Act
+        response = self.xblock.srt_to_vtt(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(response.status_code, 504)
+
+    @patch('video_xblock.mixins.HTTP_TIMEOUT', (1, 0.1))
+    def test_srt_to_vtt_body_timeout(self):
+        """
+        Test xBlock's srt-to-vtt convertation fails fast if transcript's host stalls after sending response headers.
+        """
+        # Arrange
+        request_mock = MagicMock(
+            host_url=start_stalled_server(self, response_head=STALLED_BODY_HEAD), query_string='test.srt'
+        )
+
+        # Act
+        response = self.xblock.srt_to_vtt(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(response.status_code, 504)
+
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
+    def test_srt_to_vtt_failure(self, get_mock):
+        """
+        Test xBlock's srt-to-vtt convertation reports bad gateway if transcript's host is unavailable.
+        """
+        # Arrange
+        get_mock.side_effect = requests.ConnectionError()
+        request_mock = MagicMock()
+
+        # Act
+        response = self.xblock.srt_to_vtt(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(response.status_code, 502)
+
+    @patch('video_xblock.mixins.HTTP_SESSION', new_callable=MagicMock)
+    @patch.object(VideoXBlock, 'convert_caps_to_vtt')
+    def test_srt_to_vtt_not_utf8(self, convert_caps_to_vtt_mock, session_mock):
+        """
+        Test xBlock's srt-to-vtt convertation falls back to detected charset for non UTF-8 transcripts.
+        """
+        # Arrange
+        request_mock = MagicMock()
+        convert_caps_to_vtt_mock.return_value = 'vtt transcripts'
+        session_mock.get.return_value = MagicMock(
+            content=u'caf\xe9 transcripts'.encode('cp1252'), encoding=None, text=u'caf\xe9 transcripts'
+        )
+
+        # Act
+        vtt_response = self.xblock.srt_to_vtt(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(vtt_response.text, 'vtt transcripts')
+        convert_caps_to_vtt_mock.assert_called_once_with(u'caf\xe9 transcripts')
+
+    @patch('video_xblock.mixins.HTTP_SESSION', new_callable=MagicMock)
+    @patch.object(VideoXBlock, 'convert_caps_to_vtt')
+    def test_srt_to_vtt_unknown_charset(self, convert_caps_to_vtt_mock, session_mock):
+        """
+        Test xBlock's srt-to-vtt convertation falls back to detected charset if declared one is unknown.
+        """
+        # Arrange
+        request_mock = MagicMock()
+        convert_caps_to_vtt_mock.return_value = 'vtt transcripts'
+        session_mock.get.return_value = MagicMock(
+            content='srt transcripts', encoding='utf8mb4', text=u'srt transcripts'
+        )
+
+        # Act
+        vtt_response = self.xblock.srt_to_vtt(request_mock, 'unused suffix')
+
+        # Assert
+        self.assertEqual(vtt_response.text, 'vtt transcripts')
+        convert_caps_to_vtt_mock.assert_called_once_with(u'srt transcripts')
 
     def test_fetch_available_3pm_transcripts_with_errors(self):
         """
@@ -500,10 +839,13 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
 
         with patch.object(self.xblock, 'get_3pm_transcripts_list') as threepm_transcripts_mock, \
                 patch.object(self.xblock, 'fetch_single_3pm_translation') as fetch_3pm_translation_mock, \
+                patch.object(self.xblock, 'get_player') as player_mock, \
+                patch('video_xblock.mixins.get_tpm_fetch_pool') as fetch_pool_mock, \
                 patch.object(self.xblock, 'threeplaymedia_file_id') as file_id_mock, \
                 patch.object(self.xblock, 'threeplaymedia_apikey') as apikey_mock:
             threepm_transcripts_mock.return_value = test_feedback, test_transcripts_list
             fetch_3pm_translation_mock.return_value = Transcript(*test_args)
+            player_mock.return_value.media_id.return_value = 'test_video_id'
 
             # Act:
             transcripts_gen = self.xblock.fetch_available_3pm_transcripts()
@@ -513,9 +855,51 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
             self.assertIsInstance(transcripts[0], OrderedDict)
             self.assertSequenceEqual(test_args, transcripts[0].keys())
             threepm_transcripts_mock.assert_called_once_with(file_id_mock, apikey_mock)
-            fetch_3pm_translation_mock.assert_called_once_with(test_transcripts_list[0])
+            fetch_3pm_translation_mock.assert_called_once_with(test_transcripts_list[0], video_id='test_video_id')
+            fetch_pool_mock.assert_not_called()
+
+    def test_get_tpm_fetch_pool(self):
+        """
+        Test 3PlayMedia transcripts fetching pool is shared within a process.
+        """
+        self.assertIs(get_tpm_fetch_pool(), get_tpm_fetch_pool())
 
-    @patch('video_xblock.mixins.requests.get')
+    def test_fetch_available_3pm_transcripts_keeps_order(self):
+        """
+        Test concurrently fetched 3PlayMedia transcripts are yielded in order, up to the first failure.
+        """
+        # Arrange:
+        test_feedback = {'status': Status.success, 'message': 'test_message'}
+        test_transcripts_list = [
+            {'id': 'first_id', 'language_id': '1'},
+            {'id': 'second_id', 'language_id': '2'},
+            {'id': 'failed_id', 'language_id': '3'},
+            {'id': 'last_id', 'language_id': '4'},
+        ]
+        test_args = ['label', 'lang', 'lang_id', 'content', 'format', 'video_id', 'source', 'url']
+
+        def fetch_translation_stub(transcript_data, **_kwargs):
+            """Emulate a fetching failure for a single transcript."""
+            if transcript_data['id'] == 'failed_id':
+                return None
+            return Transcript(transcript_data['id'], *test_args)
+
+        with patch.object(self.xblock, 'get_3pm_transcripts_list') as threepm_transcripts_mock, \
+                patch.object(self.xblock, 'fetch_single_3pm_translation') as fetch_3pm_translation_mock, \
+                patch.object(self.xblock, 'get_player') as player_mock:
+            threepm_transcripts_mock.return_value = test_feedback, test_transcripts_list
+            fetch_3pm_translation_mock.side_effect = fetch_translation_stub
+            player_mock.return_value.media_id.return_value = 'test_video_id'
+
+            # Act:
+            transcripts = list(self.xblock.fetch_available_3pm_transcripts())
+
+            # Assert:
+            self.assertEqual([tr['id'] for tr in transcripts], ['first_id', 'second_id'])
+            self.assertEqual(fetch_3pm_translation_mock.call_count, len(test_transcripts_list))
+            player_mock.return_value.media_id.assert_called_once_with(self.xblock.href)
+
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
     def test_get_3pm_transcripts_list_success(self, requests_get_mock):
         """
         Test fetching of the list of available 3PlayMedia transcripts (success case).
@@ -540,9 +924,45 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         self.assertTrue(requests_get_mock.json.assert_called)
         self.assertEqual(transcripts_list, test_json)
         self.assertEqual(feedback, test_feedback)
-        requests_get_mock.assert_called_once_with(test_api_url)
+        requests_get_mock.assert_called_once_with(test_api_url, timeout=HTTP_TIMEOUT)
+
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
+    def test_get_3pm_transcripts_list_cached(self, requests_get_mock):
+        """
+        Test the list of available 3PlayMedia transcripts is fetched once per file ID and API key.
+        """
+        # Arrange:
+        test_json = [{"test": "json_string"}]
+        requests_get_mock.return_value = ResponseStub(body=test_json, ok=True)
 
-    @patch('video_xblock.mixins.requests.get')
+        # Act:
+        self.xblock.get_3pm_transcripts_list('test_file_id', 'test_api_key')
+        feedback, transcripts_list = self.xblock.get_3pm_transcripts_list('test_file_id', 'test_api_key')
+        self.xblock.get_3pm_transcripts_list('test_file_id', 'other_api_key')
+
+        # Assert:
+        self.assertEqual(transcripts_list, test_json)
+        self.assertEqual(feedback['status'], Status.success)
+        self.assertEqual(requests_get_mock.call_count, 2)
+
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
+    def test_get_3pm_transcripts_list_quotes_api_key(self, requests_get_mock):
+        """
+        Test API key is escaped in the query string of 3PlayMedia API request.
+        """
+        # Arrange:
+        requests_get_mock.return_value = ResponseStub(body=[], ok=True)
+
+        # Act:
+        self.xblock.get_3pm_transcripts_list('test_file_id', 'test&api=key')
+
+        # Assert:
+        requests_get_mock.assert_called_once_with(
+            'https://static.3playmedia.com/files/test_file_id/transcripts?apikey=test%26api%3Dkey',
+            timeout=HTTP_TIMEOUT
+        )
+
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
     def test_get_3pm_transcripts_list_api_failure(self, requests_get_mock):
         """
         Test fetching of the list of available 3PlayMedia transcripts (api failure case).
@@ -561,10 +981,10 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         # Assert:
         self.assertEqual(transcripts_list, [])
         self.assertEqual(feedback, test_feedback)
-        requests_get_mock.assert_called_once_with(test_api_url)
+        requests_get_mock.assert_called_once_with(test_api_url, timeout=HTTP_TIMEOUT)
 
     @patch.object(VideoXBlock, 'get_player')
-    @patch('video_xblock.mixins.requests.get')
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
     def test_fetch_single_3pm_translation_success(self, requests_get_mock, player_mock):
         """
         Test single 3PlayMedia transcript fetching (success case).
@@ -607,7 +1027,7 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         # Assert:
         self.assertEqual(transcript, Transcript(*test_args))
 
-    @patch('video_xblock.mixins.requests.get')
+    @patch('video_xblock.mixins.HTTP_SESSION.get')
     def test_fetch_single_3pm_translation_failure(self, requests_get_mock):
         """
         Test single 3PlayMedia transcript fetching (failure case).
@@ -710,6 +1130,77 @@ class TranscriptsMixinTests(VideoXBlockTestBase):  # pylint: disable=test-inheri
         )
         get_3pm_transcripts_list_mock.assert_called_once_with("test_fileid", "test_apikey")  # Python string
 
+    @patch.object(VideoXBlock, 'get_3pm_transcripts_list')
+    def test_validate_three_play_media_config_with_invalid_credentials(self, get_3pm_transcripts_list_mock):
+        """
+        Test 3PlayMedia configuration validation (API rejects provided credentials).
+        """
+        # Arrange:
+        failure_message = _("3PlayMedia transcripts fetching API request has failed!")
+        get_3pm_transcripts_list_mock.return_value = {'status': Status.error, 'message': failure_message}, []
+        request_mock = arrange_request_mock(
+            '{"api_key": "test_apikey", "file_id": "test_fileid", "streaming_enabled": "1"}'  # JSON string
+        )
+        # Act:
+        result_response = self.xblock.validate_three_play_media_config(request_mock)
+        result = result_response.body  # pylint: disable=no-member
+
+        # Assert:
+        self.assertEqual(
+            result,
+            json.dumps({'isValid': False, 'message': failure_message}, separators=(',', ':'))
+        )
+
+    @patch.object(VideoXBlock, 'get_3pm_transcripts_list')
+    def test_validate_three_play_media_config_without_transcripts(self, get_3pm_transcripts_list_mock):
+        """
+        Test 3PlayMedia configuration validation (API responds with empty transcripts list).
+        """
+        # Arrange:
+        failure_message = _("3PlayMedia transcripts fetching API request has failed!")
+        get_3pm_transcripts_list_mock.return_value = {'status': Status.success, 'message': 'test_message'}, []
+        request_mock = arrange_request_mock(
+            '{"api_key": "test_apikey", "file_id": "test_fileid", "streaming_enabled": "1"}'  # JSON string
+        )
+        # Act:
+        result_response = self.xblock.validate_three_play_media_config(request_mock)
+        result = result_response.body  # pylint: disable=no-member
+
+        # Assert:
+        self.assertEqual(
+            result,
+            json.dumps({'isValid': False, 'message': failure_message}, separators=(',', ':'))
+        )
+
+    @patch.object(VideoXBlock, 'get_3pm_transcripts_list')
+    def test_validate_three_play_media_config_cached(self, get_3pm_transcripts_list_mock):
+        """
+        Test 3PlayMedia configuration validation result is reused for the same credentials.
+        """
+        # Arrange:
+        success_message = _('Success')
+        test_feedback = {'status': Status.success, 'message': success_message}
+        test_transcripts_list = [{"test_transcript"}]
+        get_3pm_transcripts_list_mock.return_value = test_feedback, test_transcripts_list
+        request_mock = arrange_request_mock(
+            '{"api_key": "test_apikey", "file_id": "test_fileid", "streaming_enabled": "1"}'  # JSON string
+        )
+
+        # Act:
+        first_result = self.xblock.validate_three_play_media_config(request_mock).body  # pylint: disable=no-member
+        with patch('video_xblock.mixins._', lambda text: 'translated ' + text):
+            second_result = self.xblock.validate_three_play_media_config(request_mock).body  # pylint: disable=no-member
+
+        # Assert:
+        self.assertEqual(
+            first_result, json.dumps({'isValid': True, 'message': success_message}, separators=(',', ':'))
+        )
+        self.assertEqual(
+            second_result, json.dumps({'isValid': True, 'message': 'translated Success'}, separators=(',', ':'))
+        )
+        get_3pm_transcripts_list_mock.assert_called_once_with("test_fileid", "test_apikey")
+        self.assertIs(TPM_CONFIG_VALIDATIONS[("test_apikey", "test_fileid")], True)
+
 
 class WorkbenchMixinTest(VideoXBlockTestBase):
     """